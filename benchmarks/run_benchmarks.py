@@ -0,0 +1,419 @@
+import argparse
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+# resource (for peak RSS outside of Linux) only exists on Unix. On Windows, peak RSS is not measured.
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# svgoutline renders with Qt. Make sure it doesn't need a display.
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+# Make the repository importable when this file is run directly, e.g. `python benchmarks/run_benchmarks.py`
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+# ArduinoInterface imports its neighbours (Sensor, Stepper, Servo) directly, so pycomponents must be importable too
+sys.path.insert(0, os.path.join(REPO_DIR, "pycomponents"))
+
+from svgoutline import svg_to_outlines  # noqa: E402
+import user_setup as user_settings  # noqa: E402
+import converter  # noqa: E402
+from pycomponents.hatching import hatch_fill  # noqa: E402
+from pycomponents.travel import travel_order  # noqa: E402
+from ArduinoInterface import Command, CommandType  # noqa: E402
+from synthetic_svg import GENERATORS, write_synthetic_svg  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(REPO_DIR, "benchmarks", "baseline.json")
+DEFAULT_OUTPUT = os.path.join(REPO_DIR, "benchmarks", "results.json")
+
+# Settings used for every benchmark, regardless of what is in user_setup.py, so results are comparable between runs.
+BENCHMARK_SETTINGS = {
+    "CANVAS_WIDTH": 51,
+    "CANVAS_HEIGHT": 31,
+    "TOP_PADDING": 5,
+    "LEFT_PADDING": 2,
+    "RIGHT_PADDING": 2,
+    "BOTTOM_PADDING": 5,
+    "MAX_CM_BETWEEN_POINTS": .2,
+    "FILL_CLOSED_SHAPES": False,
+    "LAYER_BY": None,
+}
+
+# Hatch spacing used for the hatch_fill stage, in mm (the units of the raw outlines)
+HATCH_SPACING_MM = 1
+HATCH_ANGLE_DEGREES = 45
+
+# Queue size used for the stream_instructions stage
+MAX_QUEUED_INSTRUCTIONS = 1000
+
+# How the drawing is split into layers for the layered_instructions stage
+BENCHMARK_LAYER_BY = "color"
+
+# Results compared against the baseline, by whether they measure time or memory
+TIME_RESULTS = ["seconds", "first_instruction_seconds"]
+MEMORY_RESULTS = ["peak_python_mb", "peak_rss_mb"]
+
+# Differences smaller than these are always treated as noise, since tiny stages vary a lot from run to run
+MIN_SECONDS_DIFFERENCE = 0.005
+MIN_MB_DIFFERENCE = 0.1
+
+# ========================================= STAGE INPUTS ========================================= #
+# Each stage runs in its own process so its peak RSS can be measured on its own. The inputs of every stage are
+# prepared once per drawing and saved in a directory, so each process only loads what its stage needs.
+
+
+def _load(work_dir: str, name: str):
+    """Load a stage input saved by prepare_inputs()."""
+    with open(os.path.join(work_dir, f"{name}.pickle"), "rb") as f:
+        return pickle.load(f)
+
+
+def _save(work_dir: str, name: str, value):
+    """Save a stage input for _load()."""
+    with open(os.path.join(work_dir, f"{name}.pickle"), "wb") as f:
+        pickle.dump(value, f)
+
+
+def prepare_inputs(drawing: str, size: int, work_dir: str):
+    """Generate a synthetic drawing and run the whole pipeline once, saving the input of each stage.
+
+    Args:
+        drawing (str): The kind of drawing to generate. Must be one of the keys of GENERATORS.
+        size (int): Multiplier for the amount of content in the drawing.
+        work_dir (str): The directory to save the inputs in.
+    """
+    svg_path = os.path.join(work_dir, "input.svg")
+    stroked_path = os.path.join(work_dir, "stroked.svg")
+
+    write_synthetic_svg(svg_path, drawing, size)
+    converter.add_strokes_to_svg(svg_path, stroked_path)
+    outlines = svg_to_outlines(ET.parse(stroked_path).getroot())
+    instructions = list(converter.outlines_to_instructions(outlines))
+    hatch = hatch_fill([line[2] for line in outlines], HATCH_SPACING_MM, HATCH_ANGLE_DEGREES)
+
+    user_settings.LAYER_BY = BENCHMARK_LAYER_BY
+    layered_instructions = sum(1 for _ in converter.outlines_to_instructions(outlines))
+    user_settings.LAYER_BY = BENCHMARK_SETTINGS["LAYER_BY"]
+
+    _save(work_dir, "outlines", outlines)
+    _save(work_dir, "instructions", instructions)
+    _save(work_dir, "hatch", hatch)
+    # How many points each stage handles, used for points per second
+    _save(work_dir, "points", {
+        "outlines": sum(len(line[2]) for line in outlines),
+        "instructions": len(instructions),
+        "layered_instructions": layered_instructions,
+        "hatch": sum(len(stroke) for stroke in hatch),
+        # travel_order only looks at the ends of each section, so it is measured in sections rather than points
+        "sections": len(outlines) + len(hatch),
+    })
+
+# ============================================ STAGES ============================================ #
+# Each stage takes the directory of inputs and returns the function to measure and the number of points it handles.
+# The function takes no arguments. If it returns a dict, those are extra results (e.g. time to first instruction).
+
+
+def stage_add_strokes_to_svg(work_dir: str):
+    svg_path = os.path.join(work_dir, "input.svg")
+    output_path = os.path.join(work_dir, "add_strokes_output.svg")
+    return lambda: converter.add_strokes_to_svg(svg_path, output_path), _load(work_dir, "points")["outlines"]
+
+
+def stage_svg_to_outlines(work_dir: str):
+    stroked_path = os.path.join(work_dir, "stroked.svg")
+    return lambda: svg_to_outlines(ET.parse(stroked_path).getroot()), _load(work_dir, "points")["outlines"]
+
+
+def stage_outlines_to_instructions(work_dir: str):
+    # Starts from the outlines, so this only measures scaling, intermediate points, and motor positions
+    outlines = _load(work_dir, "outlines")
+    return lambda: list(converter.outlines_to_instructions(outlines)), _load(work_dir, "points")["instructions"]
+
+
+def stage_hatch_fill(work_dir: str):
+    raw_sections = [line[2] for line in _load(work_dir, "outlines")]
+    return lambda: hatch_fill(raw_sections, HATCH_SPACING_MM, HATCH_ANGLE_DEGREES), _load(work_dir, "points")["hatch"]
+
+
+def stage_travel_order(work_dir: str):
+    # The outlines and hatch lines together, like a filled layer
+    sections = [line[2] for line in _load(work_dir, "outlines")] + _load(work_dir, "hatch")
+    starts = [section[0] for section in sections]
+    ends = [section[-1] for section in sections]
+    return lambda: list(travel_order(starts, ends)), _load(work_dir, "points")["sections"]
+
+
+def stage_layered_instructions(work_dir: str):
+    # Like outlines_to_instructions, but split into layers, each reordered to reduce travel
+    outlines = _load(work_dir, "outlines")
+    user_settings.LAYER_BY = BENCHMARK_LAYER_BY
+    return lambda: list(converter.outlines_to_instructions(outlines)), _load(work_dir, "points")["layered_instructions"]
+
+
+def stage_command_encoding(work_dir: str):
+    instructions = _load(work_dir, "instructions")
+
+    def encode_commands():
+        for instruction in instructions:
+            str(Command(CommandType.Stepper, 0, instruction.motor_left_position)).encode('utf-8')
+            str(Command(CommandType.Stepper, 1, instruction.motor_right_position)).encode('utf-8')
+
+    return encode_commands, _load(work_dir, "points")["instructions"]
+
+
+def stage_stream_instructions(work_dir: str):
+    # The whole conversion, from the SVG file, as it runs when STREAM_INSTRUCTIONS is on
+    stroked_path = os.path.join(work_dir, "stroked.svg")
+
+    def stream():
+        start = time.perf_counter()
+        instructions = converter.stream_instructions(converter.iter_svg_instructions(stroked_path),
+                                                     MAX_QUEUED_INSTRUCTIONS)
+        next(instructions)
+        first_instruction_seconds = time.perf_counter() - start
+        for _ in instructions:
+            pass
+        return {"first_instruction_seconds": first_instruction_seconds}
+
+    return stream, _load(work_dir, "points")["instructions"]
+
+
+# All the stages, by name, in the order they are run
+STAGES = {
+    "add_strokes_to_svg": stage_add_strokes_to_svg,
+    "svg_to_outlines": stage_svg_to_outlines,
+    "outlines_to_instructions": stage_outlines_to_instructions,
+    "hatch_fill": stage_hatch_fill,
+    "travel_order": stage_travel_order,
+    "layered_instructions": stage_layered_instructions,
+    "command_encoding": stage_command_encoding,
+    "stream_instructions": stage_stream_instructions,
+}
+
+# ========================================== MEASURING =========================================== #
+
+
+def _peak_rss_mb() -> float:
+    """Return the peak resident memory of this process so far in MB, or None if it can't be measured."""
+    # On Linux, ru_maxrss includes the peak of the parent process that started this one, so use VmHWM instead
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def measure_stage(stage: str, work_dir: str, repeats: int) -> dict:
+    """Measure one stage. Meant to be run in a fresh process (see run_stage()), so peak RSS only covers this stage.
+
+    Args:
+        stage (str): The name of the stage. Must be one of the keys of STAGES.
+        work_dir (str): The directory of inputs saved by prepare_inputs().
+        repeats (int): How many times to time the stage. The fastest time is kept, since slower
+            runs are caused by other things happening on the computer, not by the stage itself.
+
+    Returns:
+        dict: The results of the stage, or None if the stage has nothing to do on this drawing (e.g. hatch_fill on a
+            drawing without closed shapes). Those results could never show a regression, so they aren't recorded.
+    """
+    func, points = STAGES[stage](work_dir)
+    if points == 0:
+        return None
+
+    times = []
+    extra_results = {}
+    for _ in range(repeats):
+        start = time.perf_counter()
+        extras = func()
+        times.append(time.perf_counter() - start)
+        # Keep the best of any extra timings too
+        for key, value in (extras.items() if isinstance(extras, dict) else []):
+            extra_results[key] = min(value, extra_results.get(key, value))
+
+    # Peak RSS covers everything this process has done: importing, loading the stage's inputs, and running it
+    peak_rss_mb = _peak_rss_mb()
+
+    # Python memory is measured in a separate run, since tracing allocations slows everything down.
+    # It only covers memory allocated by Python, not by libraries like Qt.
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seconds = min(times)
+    return {
+        "seconds": seconds,
+        **extra_results,
+        "peak_python_mb": peak / 1024 ** 2,
+        "peak_rss_mb": peak_rss_mb,
+        "points": points,
+        "points_per_second": points / seconds if seconds > 0 else 0,
+    }
+
+
+def run_stage(stage: str, work_dir: str, repeats: int) -> dict:
+    """Measure one stage in a new process and return its results. See measure_stage()."""
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__),
+                                "--measure-stage", stage, "--work-dir", work_dir, "--repeats", str(repeats)],
+                               stdout=subprocess.PIPE, text=True, check=True)
+    # The results are the last line printed. Anything before it is output from the stage itself.
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def benchmark_drawing(drawing: str, size: int, work_dir: str, repeats: int) -> dict[str, dict]:
+    """Benchmark every stage of converting a synthetic drawing and sending it to the Arduino.
+
+    Args:
+        drawing (str): The kind of drawing to benchmark. Must be one of the keys of GENERATORS.
+        size (int): Multiplier for the amount of content in the drawing.
+        work_dir (str): An empty directory that the stage inputs can be saved in.
+        repeats (int): How many times to time each stage.
+
+    Returns:
+        dict[str, dict]: The results of each stage that had something to do, by stage name.
+    """
+    prepare_inputs(drawing, size, work_dir)
+
+    results = {}
+    for stage in STAGES:
+        result = run_stage(stage, work_dir, repeats)
+        if result is None:
+            print(f"  {stage:<26} skipped, nothing to do on this drawing")
+            continue
+        results[stage] = result
+        rss = f"{result['peak_rss_mb']:9.1f}" if result["peak_rss_mb"] is not None else "      n/a"
+        print(f"  {stage:<26} {result['seconds']:9.4f} s {result['peak_python_mb']:9.2f} MB (Python) "
+              f"{rss} MB (RSS) {result['points_per_second']:14,.0f} points/s")
+        if "first_instruction_seconds" in result:
+            print(f"  {'':<26} {result['first_instruction_seconds']:9.4f} s to first instruction")
+    return results
+
+
+def find_regressions(results: dict, baseline: dict, time_tolerance: float, memory_tolerance: float) -> list[str]:
+    """Compare results to a baseline and describe every stage that got slower or uses more memory.
+
+    Args:
+        results (dict): The results of this run.
+        baseline (dict): The results of the baseline run.
+        time_tolerance (float): How much slower a stage may get before it counts as a regression, e.g. 0.25 = 25%.
+        memory_tolerance (float): How much more memory a stage may use before it counts as a regression.
+
+    Returns:
+        list[str]: A description of each regression. Empty if there are none.
+    """
+    regressions = []
+    for drawing, stages in results["benchmarks"].items():
+        for stage, result in stages.items():
+            expected = baseline["benchmarks"].get(drawing, {}).get(stage)
+            if expected is None:
+                continue
+
+            for key in TIME_RESULTS + MEMORY_RESULTS:
+                # Skip anything that wasn't measured in both runs (e.g. peak RSS on Windows)
+                if result.get(key) is None or expected.get(key) is None:
+                    continue
+
+                if key in TIME_RESULTS:
+                    allowed = max(expected[key] * (1 + time_tolerance), expected[key] + MIN_SECONDS_DIFFERENCE)
+                else:
+                    allowed = max(expected[key] * (1 + memory_tolerance), expected[key] + MIN_MB_DIFFERENCE)
+
+                if result[key] > allowed:
+                    regressions.append(f"{drawing}/{stage} {key}: {result[key]:.4f}, baseline {expected[key]:.4f}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark SVG conversion on large synthetic drawings.")
+    parser.add_argument("--size", type=int, default=4,
+                        help="Multiplier for the amount of content in each drawing. Default: 4")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="How many times to time each stage. Default: 5")
+    parser.add_argument("--drawings", nargs="+", choices=list(GENERATORS), default=list(GENERATORS),
+                        help="Which drawings to benchmark. Default: all of them")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT,
+                        help="Where to write the results (JSON). Default: benchmarks/results.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="The baseline results to compare against (JSON). Default: benchmarks/baseline.json")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Save the results as the new baseline instead of comparing against it.")
+    parser.add_argument("--time-tolerance", type=float, default=0.25,
+                        help="How much slower a stage may get before failing, e.g. 0.25 = 25%%. Default: 0.25")
+    parser.add_argument("--memory-tolerance", type=float, default=0.10,
+                        help="How much more memory a stage may use before failing. Default: 0.10")
+    # Used internally to measure each stage in its own process
+    parser.add_argument("--measure-stage", choices=list(STAGES), help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    for setting, value in BENCHMARK_SETTINGS.items():
+        setattr(user_settings, setting, value)
+
+    if args.measure_stage:
+        print(json.dumps(measure_stage(args.measure_stage, args.work_dir, args.repeats)))
+        return 0
+
+    results = {
+        "size": args.size,
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "benchmarks": {},
+    }
+
+    for drawing in args.drawings:
+        print(f"{drawing}:")
+        with tempfile.TemporaryDirectory() as work_dir:
+            results["benchmarks"][drawing] = benchmark_drawing(drawing, args.size, work_dir, args.repeats)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline found at {args.baseline}. Run with --update-baseline to create one.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    if baseline["size"] != args.size:
+        print(f"Baseline was recorded with --size {baseline['size']}, not {args.size}. Can't compare.")
+        return 1
+
+    regressions = find_regressions(results, baseline, args.time_tolerance, args.memory_tolerance)
+    if regressions:
+        print("Regressions compared to the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+
+    print("No regressions compared to the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+from math import cos, sin, pi
+import random
+
+# Generates large synthetic SVG files for the benchmarks.
+# The same kind, size, and seed always produce exactly the same file, so results can be compared between runs.
+
+# Size of the generated drawings, in mm
+WIDTH = 500
+HEIGHT = 300
+
+# Stroke colors used by drawings with more than one color, so they can be split into layers
+COLORS = ["black", "red", "green", "blue"]
+
+
+def _polygon_path(rng: random.Random, cx: float, cy: float, radius: float, corners: int) -> str:
+    """Return the path data for a closed, irregular polygon centered on (cx, cy)."""
+    points = []
+    for i in range(corners):
+        angle = 2 * pi * i / corners
+        r = radius * rng.uniform(0.6, 1)
+        points.append(f"{cx + r * cos(angle):.3f},{cy + r * sin(angle):.3f}")
+    return "M" + " L".join(points) + " Z"
+
+
+def many_small_paths(rng: random.Random, size: int) -> list[str]:
+    """Lots of small, separate shapes in a few colors. Stresses per-section overhead and travel ordering."""
+    elements = []
+    for _ in range(size * 200):
+        cx, cy = rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)
+        path = _polygon_path(rng, cx, cy, rng.uniform(1, 5), rng.randint(3, 8))
+        elements.append(f'<path d="{path}" stroke="{rng.choice(COLORS)}"/>')
+    return elements
+
+
+def clustered_paths(rng: random.Random, size: int) -> list[str]:
+    """Lots of tiny shapes packed into one spot, plus a few far away from it. Stresses travel ordering, which has to
+    stay fast when the shapes are spread out very unevenly."""
+    elements = []
+    for _ in range(size * 500):
+        cx, cy = rng.gauss(WIDTH / 2, 5), rng.gauss(HEIGHT / 2, 5)
+        elements.append(f'<path d="{_polygon_path(rng, cx, cy, rng.uniform(0.2, 1), rng.randint(3, 8))}"/>')
+    for _ in range(10):
+        cx, cy = rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)
+        elements.append(f'<path d="{_polygon_path(rng, cx, cy, rng.uniform(1, 5), rng.randint(3, 8))}"/>')
+    return elements
+
+
+def few_huge_paths(rng: random.Random, size: int) -> list[str]:
+    """A handful of closed paths with a very large number of points each. Stresses per-point work."""
+    elements = []
+    for _ in range(4):
+        x, y = rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)
+        points = []
+        for _ in range(size * 2500):
+            x = min(max(x + rng.uniform(-3, 3), 0), WIDTH)
+            y = min(max(y + rng.uniform(-3, 3), 0), HEIGHT)
+            points.append(f"{x:.3f},{y:.3f}")
+        # Closed, so hatching has to handle huge, self-intersecting shapes too
+        elements.append(f'<path d="M{" L".join(points)} Z"/>')
+    return elements
+
+
+def dense_beziers(rng: random.Random, size: int) -> list[str]:
+    """Paths made of many tightly-curved cubic Béziers, half of them closed. Stresses curve flattening."""
+    elements = []
+    for i in range(size * 20):
+        x, y = rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT)
+        commands = [f"M{x:.3f},{y:.3f}"]
+        for _ in range(50):
+            controls = [(x + rng.uniform(-20, 20), y + rng.uniform(-20, 20)) for _ in range(3)]
+            x, y = controls[-1]
+            commands.append("C" + " ".join(f"{cx:.3f},{cy:.3f}" for cx, cy in controls))
+        if i % 2:
+            commands.append("Z")
+        elements.append(f'<path d="{" ".join(commands)}"/>')
+    return elements
+
+
+def deep_transform_nesting(rng: random.Random, size: int) -> list[str]:
+    """Shapes buried under many levels of transformed groups. Stresses transform handling."""
+    elements = []
+    # Qt refuses to render SVGs nested more than 32 levels deep (counting the <svg> and the <path>)
+    depth = 30
+    for _ in range(size * 5):
+        opening, closing = [], []
+        for _ in range(depth):
+            transform = (f"translate({rng.uniform(-2, 2):.3f},{rng.uniform(-2, 2):.3f}) "
+                         f"rotate({rng.uniform(-10, 10):.3f}) "
+                         f"scale({rng.uniform(0.98, 1.02):.4f})")
+            # Each level also draws a shape, so every depth is exercised
+            shape = _polygon_path(rng, WIDTH / 2, HEIGHT / 2, rng.uniform(5, 50), 6)
+            opening.append(f'<g transform="{transform}"><path d="{shape}"/>')
+            closing.append("</g>")
+        elements.append("".join(opening) + "".join(closing))
+    return elements
+
+
+# All the kinds of drawing that can be generated, by name
+GENERATORS = {
+    "many_small_paths": many_small_paths,
+    "clustered_paths": clustered_paths,
+    "few_huge_paths": few_huge_paths,
+    "dense_beziers": dense_beziers,
+    "deep_transform_nesting": deep_transform_nesting,
+}
+
+
+def write_synthetic_svg(output_file: str, kind: str, size: int = 1, seed: int = 0):
+    """Write a synthetic SVG file.
+
+    Args:
+        output_file (str): The path to the output SVG file.
+        kind (str): The kind of drawing to generate. Must be one of the keys of GENERATORS.
+        size (int, optional): Multiplier for the amount of content in the drawing. Defaults to 1.
+        seed (int, optional): Seed for the random number generator. Defaults to 0.
+
+    Raises:
+        ValueError: If kind is not a known kind of drawing.
+    """
+    if kind not in GENERATORS:
+        raise ValueError(f"Unknown kind of drawing: {kind}. Must be one of {list(GENERATORS)}.")
+
+    # Seed with the kind as well, so each kind is independent of which others are generated
+    rng = random.Random(f"{kind}-{seed}")
+    elements = GENERATORS[kind](rng, size)
+
+    with open(output_file, "w") as f:
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}mm" height="{HEIGHT}mm" '
+                f'viewBox="0 0 {WIDTH} {HEIGHT}" fill="none" stroke="black" stroke-width="0.5">\n')
+        for element in elements:
+            f.write(element + "\n")
+        f.write("</svg>\n")
@@ -0,0 +1,440 @@
+from dataclasses import dataclass
+from math import sqrt
+import queue
+import re
+import threading
+from typing import Iterator
+from svgoutline import svg_to_outlines
+import constants
+import user_setup as user_settings
+import xml.etree.ElementTree as ET
+from pycomponents.hatching import hatch_fill, is_closed
+from pycomponents.travel import travel_order
+
+# Converts SVG files into PointInstructions for the plotter.
+# Kept separate from main.py so it can be used without connecting to the Arduino (e.g. by the benchmarks).
+
+
+@dataclass
+class PointInstruction:
+    """Represents a point in the drawing with instructions for the motors and pen.
+    x_cm and y_cm are the coordinates of the point in cm, where the bottom left of the canvas is (0,0).
+    motor_left_position and motor_right_position are the number of steps each motor needs to take to reach that point.
+    pen_down_after is a boolean value that determines whether the pen should be down after reaching that point.
+    """
+    x_cm: float
+    y_cm: float
+    # Map the x and y cm to the position of each motor (in steps) to reach that point.
+    # Note, steps are relative to start, not current position.
+    motor_left_position: int
+    motor_right_position: int
+    # Put the pen down after this point or not
+    pen_down_after: bool
+    # The layer this point belongs to (see LAYER_BY in user_setup.py). None if the drawing isn't split into layers.
+    layer: str = None
+
+
+def _style_property(elem: ET.Element, name: str) -> str:
+    """Return the value of a style property (e.g. 'stroke') set on the element itself, or None if it isn't set.
+    A value in the style attribute takes priority over the attribute of the same name, like in a browser."""
+    value = elem.get(name)
+    for declaration in elem.get('style', '').split(';'):
+        key, _, style_value = declaration.partition(':')
+        if key.strip() == name:
+            value = style_value.strip()
+    # 'inherit' means the same as not setting the property
+    return None if value == 'inherit' else value
+
+
+def _clear_stroke(elem: ET.Element):
+    """Remove the stroke color and width of an element, so they are inherited instead."""
+    if 'style' in elem.attrib:
+        declarations = [d for d in elem.get('style').split(';')
+                        if d.partition(':')[0].strip() not in ('stroke', 'stroke-width')]
+        elem.set('style', ';'.join(declarations))
+    elem.attrib.pop('stroke', None)
+    elem.attrib.pop('stroke-width', None)
+
+
+def _set_stroke(elem: ET.Element, color: str, in_style: bool = False):
+    """Set the stroke color of an element, along with an arbitrary stroke width.
+    If in_style is True, they are set in the style attribute, which also takes priority over <style> stylesheets."""
+    # Remove any stroke set in the style attribute first, since it would take priority over the attributes
+    _clear_stroke(elem)
+    if in_style:
+        declarations = [d for d in elem.get('style', '').split(';') if d.strip()]
+        elem.set('style', ';'.join(declarations + [f'stroke:{color}', 'stroke-width:2']))
+    else:
+        elem.set('stroke', color)
+        elem.set('stroke-width', '2')
+
+
+def _is_definition(elem: ET.Element) -> bool:
+    """Return whether the element holds content that is only drawn where a <use> element refers to it.
+    That content inherits its stroke from the <use> element, not from its own parents."""
+    return elem.tag.split('}')[-1] in ('defs', 'symbol')
+
+
+def add_strokes_to_svg(input_file: str, output_file: str):
+    """Add stroke and stroke-width attributes to all elements in an SVG file.
+    This is necessary for the svgoutline library to work properly.
+    Elements keep their stroke color if they have one. Otherwise, they are given their fill color as a stroke color,
+    so a drawing can still be split into layers by color (see LAYER_BY in user_setup.py).
+
+    Args:
+        input_file (str): The path to the input SVG file.
+        output_file (str): The path to the output SVG file.
+    """
+    # Parse the SVG file
+    tree = ET.parse(input_file)
+    root = tree.getroot()
+
+    def add_strokes(elem: ET.Element, parent_stroke: str, parent_fill: str):
+        # Stroke and fill are inherited from the parent element unless the element sets its own
+        stroke = _style_property(elem, 'stroke') or parent_stroke
+        fill = _style_property(elem, 'fill') or parent_fill
+
+        # The width is arbitrary as far as this program is concerned. All that matters is that it is there.
+        _set_stroke(elem, stroke if stroke != 'none' else fill if fill != 'none' else 'black')
+
+        for child in elem:
+            if _is_definition(child):
+                add_definition_strokes(child, None)
+            else:
+                add_strokes(child, stroke, fill)
+
+    def add_definition_strokes(elem: ET.Element, parent_stroke: str):
+        # Content inside <defs> and <symbol> inherits from whichever <use> element draws it, which has already been
+        # given a stroke above. So only keep strokes set inside the definition, and let everything else be inherited.
+        stroke = _style_property(elem, 'stroke') or parent_stroke
+        if stroke is not None and stroke != 'none':
+            _set_stroke(elem, stroke)
+        else:
+            _clear_stroke(elem)
+
+        for child in elem:
+            add_definition_strokes(child, stroke)
+
+    # SVG elements have no stroke and a black fill by default
+    add_strokes(root, 'none', 'black')
+
+    # Write the updated SVG to a new file
+    tree.write(output_file)
+
+
+def _remove_stylesheet_strokes(root: ET.Element):
+    """Remove the stroke color declarations from every <style> element, so they can't override the stroke of any
+    element (including elements inside <defs>, which can't be given a stroke of their own)."""
+    for elem in root.iter():
+        if elem.tag.split('}')[-1] == 'style' and elem.text:
+            elem.text = re.sub(r'(?<![\w-])stroke\s*:[^;}]*;?', '', elem.text)
+
+
+def _set_drawn_strokes(elem: ET.Element, color: str):
+    """Set the stroke color of an element and everything inside it.
+    Content inside <defs> and <symbol> is left to inherit its stroke from the <use> element that draws it."""
+    if _is_definition(elem):
+        for definition in elem.iter():
+            _clear_stroke(definition)
+        return
+
+    _set_stroke(elem, color, in_style=True)
+    for child in elem:
+        _set_drawn_strokes(child, color)
+
+
+def _layer_groups(root: ET.Element) -> list[ET.Element]:
+    """Return the layers of an SVG: the <g> elements directly inside the <svg> element."""
+    return [elem for elem in root if elem.tag.split('}')[-1] == 'g']
+
+
+def _index_to_color(index: int) -> str:
+    """Encode a number as a unique color, e.g. 1 -> '#000001'."""
+    return f"#{index:06x}"
+
+
+def _color_to_index(color: tuple[float, float, float, float]) -> int:
+    """Decode a color from svg_to_outlines (RGBA values from 0 to 1) that was made by _index_to_color."""
+    r, g, b = (round(value * 255) for value in color[:3])
+    return (r << 16) + (g << 8) + b
+
+
+def _color_to_layer_name(color: tuple[float, float, float, float], layer_names: list[str]) -> str:
+    """Find the name of the layer an outline is in, from its color (see iter_svg_instructions()).
+
+    Raises:
+        ValueError: If the color isn't one that was given to a layer.
+    """
+    if color is None:
+        # Gradients and patterns don't have a single color, and can't have been given a layer's color
+        return layer_names[0]
+    index = _color_to_index(color)
+    if index >= len(layer_names):
+        raise ValueError(f"Couldn't tell which layer an outline is in, because something in the SVG changed its "
+                         f"stroke color to {_color_to_name(color)}. Try LAYER_BY = \"color\" instead.")
+    return layer_names[index]
+
+
+def _color_to_name(color: tuple[float, float, float, float]) -> str:
+    """Turn a color from svg_to_outlines (RGBA values from 0 to 1) into a hex color, e.g. '#ff0000'."""
+    if color is None:
+        # Gradients and patterns don't have a single color
+        return "other"
+    r, g, b = (round(value * 255) for value in color[:3])
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def iter_svg_instructions(svg_path: str) -> Iterator[PointInstruction]:
+    """Lazily generate PointInstructions from an SVG file.
+    The SVG is parsed and its bounding box is measured immediately. Everything after that (scaling, filling,
+    intermediate points, motor positions) is done one section at a time, as instructions are requested.
+    The exception is FILL_CLOSED_SHAPES: every closed section is kept until the outlines are done, and then all
+    hatch lines are generated at once, so with filling on, memory use grows with the size of the drawing.
+
+    Args:
+        svg_path (str): The path to the SVG file that will be converted to instructions.
+
+    Returns:
+        Iterator[PointInstruction]: The instructions, in drawing order.
+    """
+
+    # Get raw points. These will later be scaled to the canvas size, but may have any range of values right now.
+    tree = ET.parse(svg_path)
+    root = tree.getroot()
+
+    layer_names = None
+    if user_settings.LAYER_BY == "group":
+        # svg_to_outlines only tells us the color of each outline, not which element it came from.
+        # To find out which layer each outline is in, temporarily give every layer its own color: the layer's number.
+        # Anything outside of a layer is given number 0.
+        # A <use> element is in the layer it is placed in, not the layer its content is defined in.
+        # Stylesheets would override these colors, so their strokes are removed first.
+        _remove_stylesheet_strokes(root)
+        layer_names = ["Not in a layer"]
+        _set_drawn_strokes(root, _index_to_color(0))
+        for i, group in enumerate(_layer_groups(root), start=1):
+            layer_names.append(group.get('id') or f"Layer {i}")
+            _set_drawn_strokes(group, _index_to_color(i))
+
+    outlines = svg_to_outlines(root)
+    del tree, root
+    return outlines_to_instructions(outlines, layer_names)
+
+
+def outlines_to_instructions(outlines: list, layer_names: list[str] = None) -> Iterator[PointInstruction]:
+    """Lazily generate PointInstructions from the outlines of an SVG. See iter_svg_instructions().
+
+    Args:
+        outlines (list): The outlines of the SVG, as returned by svg_to_outlines.
+        layer_names (list[str], optional): The name of each layer, by the number encoded in its outlines' color.
+            Only needed if LAYER_BY is "group". Defaults to None.
+
+    Returns:
+        Iterator[PointInstruction]: The instructions, in drawing order.
+    """
+
+    # ====================================== GET STARTING POINTS ===================================== #
+
+    frame_width = user_settings.CANVAS_WIDTH - user_settings.LEFT_PADDING - user_settings.RIGHT_PADDING
+    frame_height = user_settings.CANVAS_HEIGHT - user_settings.TOP_PADDING - user_settings.BOTTOM_PADDING
+
+    # List of lists of points. Each sublist is a disconnected section of the drawing.
+    raw_sections = [line[2] for line in outlines]
+
+    # The layer of each section. Only needed if the drawing is split into layers.
+    if user_settings.LAYER_BY == "group":
+        raw_layers = [_color_to_layer_name(line[0], layer_names) for line in outlines]
+    elif user_settings.LAYER_BY == "color":
+        raw_layers = [_color_to_name(line[0]) for line in outlines]
+    del outlines
+
+    # Determine the minimum and maximum x and y values of the drawing
+    # These will be used to scale the drawing to the canvas size
+    # This is the only step that needs to see the whole drawing before the first instruction is generated.
+    # All layers are scaled using the same bounding box, so they line up with each other.
+    min_x = min(x for section in raw_sections for x, _ in section)
+    max_x = max(x for section in raw_sections for x, _ in section)
+    min_y = min(y for section in raw_sections for _, y in section)
+    max_y = max(y for section in raw_sections for _, y in section)
+
+    # ============================================ SCALING =========================================== #
+    # Scale all points to fit in the frame
+
+    # Calculate the scale factor to fit the drawing to the canvas
+    x_scale_factor = frame_width / (max_x - min_x)
+    y_scale_factor = frame_height / (max_y - min_y)
+
+    # Maintain aspect ratio by using the smaller scale factor
+    scale_factor = min(x_scale_factor, y_scale_factor)
+
+    # Calculate the center offset to keep the drawing centered
+    x_center_offset = (frame_width - (max_x - min_x) * scale_factor) / 2
+    y_center_offset = (frame_height - (max_y - min_y) * scale_factor) / 2
+
+    def scale_raw_xy(x, y):
+        """Take in a raw x and y value and scale it to the canvas size. Only used in outlines_to_instructions."""
+        scaled_x = (x - min_x) * scale_factor + user_settings.LEFT_PADDING + x_center_offset
+        scaled_y = (y - min_y) * scale_factor + y_center_offset
+        scaled_y = user_settings.CANVAS_HEIGHT - user_settings.TOP_PADDING - scaled_y
+        return scaled_x, scaled_y
+
+    def iter_sections():
+        """Yield each scaled section, followed by the hatch lines that fill the closed ones."""
+        # Closed sections are kept (already scaled) so they can be filled once all outlines have been drawn
+        fill_sections = []
+
+        # Hand the raw sections over one at a time so each can be freed once it has been scaled
+        raw_sections.reverse()
+        while raw_sections:
+            section = [scale_raw_xy(x, y) for x, y in raw_sections.pop()]
+            if user_settings.FILL_CLOSED_SHAPES and is_closed(section):
+                fill_sections.append(section)
+            yield None, section
+
+        # ============================================ FILLING =========================================== #
+        # Fill closed shapes with hatch lines. Done after scaling so the hatch spacing is in cm on the canvas.
+        if fill_sections:
+            for section in hatch_fill(fill_sections, user_settings.HATCH_SPACING_CM, user_settings.HATCH_ANGLE_DEGREES):
+                yield None, section
+
+    def in_travel_order(sections, start, scale):
+        """Yield the sections in an order that reduces travel from start. Only the ends of each section are needed
+        up front, so if scale is True, each raw section is only scaled once it is reached."""
+        if scale:
+            starts = [scale_raw_xy(*section[0]) for section in sections]
+            ends = [scale_raw_xy(*section[-1]) for section in sections]
+        else:
+            starts = [section[0] for section in sections]
+            ends = [section[-1] for section in sections]
+
+        for i, backwards in travel_order(starts, ends, start):
+            section = [scale_raw_xy(x, y) for x, y in sections[i]] if scale else sections[i]
+            # Free each section once it has been handed over
+            sections[i] = None
+            yield section[::-1] if backwards else section
+
+    def iter_layered_sections():
+        """Yield each scaled section along with its layer, one layer at a time.
+        Sections within a layer are reordered to reduce travel, as they are needed."""
+        layers = {}
+        for layer, raw_section in zip(raw_layers, raw_sections):
+            layers.setdefault(layer, []).append(raw_section)
+        raw_sections.clear()
+
+        # Layers listed in LAYER_ORDER are drawn first, in that order. The rest follow in the order they appear.
+        order = [layer for layer in user_settings.LAYER_ORDER if layer in layers]
+        order += [layer for layer in layers if layer not in order]
+
+        # Start each layer near where the previous one ended
+        position = None
+        for layer in order:
+            # Closed sections are kept (already scaled) so they can be filled once the layer's outlines have been drawn
+            fill_sections = []
+
+            for section in in_travel_order(layers.pop(layer), position, scale=True):
+                if user_settings.FILL_CLOSED_SHAPES and is_closed(section):
+                    fill_sections.append(section)
+                yield layer, section
+                position = section[-1]
+
+            # Fill each layer separately, so fills of different colors don't cancel each other out as holes
+            if fill_sections:
+                hatch = hatch_fill(fill_sections, user_settings.HATCH_SPACING_CM, user_settings.HATCH_ANGLE_DEGREES)
+                for section in in_travel_order(hatch, position, scale=False):
+                    yield layer, section
+                    position = section[-1]
+
+    # ====================================== INTERMEDIATE POINTS ===================================== #
+    # Add intermediate points in the drawing. Necessary to avoid arcs when drawing straight lines.
+
+    def add_intermediate_points(section):
+        """Add intermediate points to the sections to smooth out the drawing.
+
+        Args:
+            section (list): List of points [(x1, y1), (x2, y2), ...]
+
+        Returns:
+            list: New section with intermediate points.
+        """
+        new_section = []
+        for i in range(len(section) - 1):
+            x1, y1 = section[i]
+            x2, y2 = section[i + 1]
+            new_section.append((x1, y1))
+            distance = sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+            num_points = int(distance // user_settings.MAX_CM_BETWEEN_POINTS)
+            for j in range(1, num_points + 1):
+                new_x = x1 + j * (x2 - x1) / (num_points + 1)
+                new_y = y1 + j * (y2 - y1) / (num_points + 1)
+                new_section.append((new_x, new_y))
+        new_section.append(section[-1])
+        return new_section
+
+    # ======================================== MOTOR DISTANCES ======================================= #
+
+    def xy_to_motor_position(x, y):
+        steps_per_cm = constants.STEPS_PER_REVOLUTION * constants.REVOLUTIONS_PER_CM
+        cm_from_top = user_settings.CANVAS_HEIGHT - y - constants.PEN_VERTICAL_OFFSET
+        cm_from_right = user_settings.CANVAS_WIDTH - x + constants.PEN_HOLDER_WIDTH
+        cm_from_left = x + constants.PEN_HOLDER_WIDTH
+        top_left_motor_position = steps_per_cm * sqrt(cm_from_top ** 2 + cm_from_left ** 2)
+        top_right_motor_position = steps_per_cm * sqrt(cm_from_top ** 2 + cm_from_right ** 2)
+        return top_left_motor_position, top_right_motor_position
+
+    def iter_instructions():
+        sections = iter_layered_sections() if user_settings.LAYER_BY else iter_sections()
+        for layer, section in sections:
+            section = add_intermediate_points(section)
+            for i, (x, y) in enumerate(section):
+                motor_left_position, motor_right_position = xy_to_motor_position(x, y)
+                # At the end of each section, lift the pen up
+                pen_down_after = i < len(section) - 1
+                yield PointInstruction(x, y, motor_left_position, motor_right_position, pen_down_after, layer)
+
+    return iter_instructions()
+
+
+def svg_to_instructions(svg_path: str) -> list[PointInstruction]:
+    """Generate a list of PointInstructions from an SVG file.
+
+    Args:
+        svg_path (str): The path to the SVG file that will be converted to instructions.
+    """
+    return list(iter_svg_instructions(svg_path))
+
+
+def stream_instructions(instructions: Iterator[PointInstruction], max_queued: int) -> Iterator[PointInstruction]:
+    """Generate instructions in a background thread while they are being drawn.
+    At most max_queued instructions wait in the queue at once, so the queue never grows with the size of the drawing.
+    Conversion itself may still hold more (see iter_svg_instructions(), e.g. when filling closed shapes).
+
+    Args:
+        instructions (Iterator[PointInstruction]): The instructions to generate, e.g. from iter_svg_instructions().
+        max_queued (int): The maximum number of instructions waiting to be drawn.
+
+    Returns:
+        Iterator[PointInstruction]: The same instructions, in the same order.
+    """
+    instruction_queue = queue.Queue(maxsize=max_queued)
+    # Put on the queue after the last instruction to mark the end of the drawing
+    done = object()
+
+    def produce():
+        try:
+            for instruction in instructions:
+                instruction_queue.put(instruction)
+        except Exception as e:
+            # Pass the error along so it is raised where the instructions are being drawn
+            instruction_queue.put(e)
+        instruction_queue.put(done)
+
+    # Daemon thread, so an abandoned drawing doesn't keep the program running
+    threading.Thread(target=produce, daemon=True).start()
+
+    while True:
+        item = instruction_queue.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
@@ -1,17 +1,16 @@
-from dataclasses import dataclass
-from math import sqrt
 import os
 import time
-from svgoutline import svg_to_outlines
+from typing import Iterable
 import turtle
 import constants
 import user_setup as user_settings
-import xml.etree.ElementTree as ET
 from progress.bar import ChargingBar
+from progress.counter import Counter
 import cv2
 import pycomponents.ArduinoInterface as ArduinoInterface
 from pycomponents.Stepper import StepperDirection as StepperDirection
 from pycomponents.Servo import ServoConnectionType, ServoActuationType, ServoInverted 
+from converter import PointInstruction, add_strokes_to_svg, iter_svg_instructions, svg_to_instructions, stream_instructions
 
 # =========================================== WARNINGS =========================================== #
 # Make sure user isn't accidentally starting from a point other than 0
@@ -61,23 +60,6 @@ Arduino = ArduinoInterface.Arduino(user_settings.ARDUINO_USB_PORT,
                                    [SteppersFinishedSensor])
 
 
-@dataclass
-class PointInstruction:
-    """Represents a point in the drawing with instructions for the motors and pen.
-    x_cm and y_cm are the coordinates of the point in cm, where the bottom left of the canvas is (0,0).
-    motor_left_position and motor_right_position are the number of steps each motor needs to take to reach that point.
-    pen_down_after is a boolean value that determines whether the pen should be down after reaching that point.
-    """
-    x_cm: float
-    y_cm: float
-    # Map the x and y cm to the position of each motor (in steps) to reach that point.
-    # Note, steps are relative to start, not current position.
-    motor_left_position: int
-    motor_right_position: int
-    # Put the pen down after this point or not
-    pen_down_after: bool
-
-
 class PenController:
     def __init__(self, ArdI: ArduinoInterface.Arduino):
         self.ArdI = ArdI
@@ -127,136 +109,6 @@ Pen = PenController(Arduino)
 # ======================================= PRIMARY FUNCTIONS ====================================== #
 
 
-def add_strokes_to_svg(input_file: str, output_file: str):
-    """Add stroke and stroke-width attributes to all elements in an SVG file.
-    This is necessary for the svgoutline library to work properly.
-
-    Args:
-        input_file (str): The path to the input SVG file.
-        output_file (str): The path to the output SVG file.
-    """
-    # Parse the SVG file
-    tree = ET.parse(input_file)
-    root = tree.getroot()
-
-    # Iterate over all elements in the SVG
-    for elem in root.iter():
-        # Add stroke and stroke-width attributes to each element
-        # The color and width are arbitrary as far as this program is concerned. All that matters is that they are there.
-        elem.set('stroke', 'red')
-        elem.set('stroke-width', '2')
-
-    # Write the updated SVG to a new file
-    tree.write(output_file)
-
-
-def svg_to_instructions(svg_path: str):
-    """Generate a list of PointInstructions from an SVG file.
-
-    Args:
-        svg_path (str): The path to the SVG file that will be converted to instructions.
-    """
-
-    # ====================================== GET STARTING POINTS ===================================== #
-
-    frame_width = user_settings.CANVAS_WIDTH - user_settings.LEFT_PADDING - user_settings.RIGHT_PADDING
-    frame_height = user_settings.CANVAS_HEIGHT - user_settings.TOP_PADDING - user_settings.BOTTOM_PADDING
-
-    # Get raw points. These will later be scaled to the canvas size, but may have any range of values right now.
-    tree = ET.parse(svg_path)
-    root = tree.getroot()
-    outlines = svg_to_outlines(root)
-    # List of lists of points. Each sublist is a disconnected section of the drawing.
-    raw_sections = [line[2] for line in outlines]
-
-    raw_all_points = [point for section in raw_sections for point in section]
-
-    # Determine the minimum and maximum x and y values of the drawing
-    # These will be used to scale the drawing to the canvas size
-    min_x = min([point[0] for point in raw_all_points])
-    max_x = max([point[0] for point in raw_all_points])
-    min_y = min([point[1] for point in raw_all_points])
-    max_y = max([point[1] for point in raw_all_points])
-
-    # ============================================ SCALING =========================================== #
-    # Scale all points to fit in the frame
-
-    # Calculate the scale factor to fit the drawing to the canvas
-    x_scale_factor = frame_width / (max_x - min_x)
-    y_scale_factor = frame_height / (max_y - min_y)
-
-    # Maintain aspect ratio by using the smaller scale factor
-    scale_factor = min(x_scale_factor, y_scale_factor)
-
-    # Calculate the center offset to keep the drawing centered
-    x_center_offset = (frame_width - (max_x - min_x) * scale_factor) / 2
-    y_center_offset = (frame_height - (max_y - min_y) * scale_factor) / 2
-
-    def scale_raw_xy(x, y):
-        """Take in a raw x and y value and scale it to the canvas size. Only used in svg_to_instructions."""
-        scaled_x = (x - min_x) * scale_factor + user_settings.LEFT_PADDING + x_center_offset
-        scaled_y = (y - min_y) * scale_factor + y_center_offset
-        scaled_y = user_settings.CANVAS_HEIGHT - user_settings.TOP_PADDING - scaled_y
-        return scaled_x, scaled_y
-
-    sections = []
-
-    for raw_section in raw_sections:
-        section = [scale_raw_xy(x, y) for x, y in raw_section]
-        sections.append(section)
-
-    # ====================================== INTERMEDIATE POINTS ===================================== #
-    # Add intermediate points in the drawing. Necessary to avoid arcs when drawing straight lines.
-
-    def add_intermediate_points(section):
-        """Add intermediate points to the sections to smooth out the drawing.
-
-        Args:
-            section (list): List of points [(x1, y1), (x2, y2), ...]
-
-        Returns:
-            list: New section with intermediate points.
-        """
-        new_section = []
-        for i in range(len(section) - 1):
-            x1, y1 = section[i]
-            x2, y2 = section[i + 1]
-            new_section.append((x1, y1))
-            distance = sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
-            num_points = int(distance // user_settings.MAX_CM_BETWEEN_POINTS)
-            for j in range(1, num_points + 1):
-                new_x = x1 + j * (x2 - x1) / (num_points + 1)
-                new_y = y1 + j * (y2 - y1) / (num_points + 1)
-                new_section.append((new_x, new_y))
-        new_section.append(section[-1])
-        return new_section
-
-    interpolated_sections = [add_intermediate_points(section) for section in sections]
-
-    # ======================================== MOTOR DISTANCES ======================================= #
-
-    def xy_to_motor_position(x, y):
-        steps_per_cm = constants.STEPS_PER_REVOLUTION * constants.REVOLUTIONS_PER_CM
-        cm_from_top = user_settings.CANVAS_HEIGHT - y - constants.PEN_VERTICAL_OFFSET
-        cm_from_right = user_settings.CANVAS_WIDTH - x + constants.PEN_HOLDER_WIDTH
-        cm_from_left = x + constants.PEN_HOLDER_WIDTH
-        top_left_motor_position = steps_per_cm * sqrt(cm_from_top ** 2 + cm_from_left ** 2)
-        top_right_motor_position = steps_per_cm * sqrt(cm_from_top ** 2 + cm_from_right ** 2)
-        return top_left_motor_position, top_right_motor_position
-
-    instructions = []
-
-    for section in interpolated_sections:
-        for x, y in section:
-            motor_left_position, motor_right_position = xy_to_motor_position(x, y)
-            instructions.append(PointInstruction(x, y, motor_left_position, motor_right_position, True))
-
-        # At the end of each section, lift the pen up
-        instructions[-1].pen_down_after = False
-
-    return instructions
-
-
 def prep_background(input: str, output: str, width: int, height: int):
     """Helper function for draw().
     Resizes the input image that will be the background of the drawing.
@@ -293,11 +145,12 @@ def prep_background(input: str, output: str, width: int, height: int):
     cv2.imwrite(output, resized)
 
 
-def draw(instructions: list[PointInstruction], only_preview=False):
+def draw(instructions: Iterable[PointInstruction], only_preview=False):
     """Draw the given instructions on the canvas. Show a digital preview of the drawing as well
 
     Args:
-        instructions (list[PointInstruction]): The list of instructions to draw.
+        instructions (Iterable[PointInstruction]): The instructions to draw. Either a list, or an iterator
+            (e.g. from stream_instructions()) if the instructions are still being generated.
         only_preview (bool, optional): Whether to only show a preview of the drawing. Defaults to False.
     """
 
@@ -342,7 +195,14 @@ def draw(instructions: list[PointInstruction], only_preview=False):
     t.penup()
 
     # Progress bar to show how many points have been drawn. Will be shown in the console.
-    bar = ChargingBar('Drawing', max=len(instructions))
+    # If the instructions are still being generated, the total isn't known yet, so just count the points instead.
+    if isinstance(instructions, list):
+        bar = ChargingBar('Drawing', max=len(instructions))
+    else:
+        bar = Counter('Points drawn: ')
+
+    # The layer currently being drawn. Used to know when to stop for a pen swap.
+    current_layer = None
 
     # ====================================== DRAWING THE POINTS ====================================== #
     for i, instruction in enumerate(instructions):
@@ -351,6 +211,13 @@ def draw(instructions: list[PointInstruction], only_preview=False):
             bar.next()
             continue
 
+        # Swap pens whenever a new layer starts (including the first layer drawn)
+        if instruction.layer != current_layer:
+            current_layer = instruction.layer
+            if not only_preview and current_layer is not None:
+                Pen.raise_pen()
+                input(f"\nStarting layer {current_layer}. Put in the pen for this layer and press Enter.")
+
         t.goto(instruction.x_cm, instruction.y_cm)
         t.pendown() if instruction.pen_down_after else t.penup()
 
@@ -387,13 +254,22 @@ if __name__ == "__main__":
 
     print("Preprocessing SVG file...")
     add_strokes_to_svg(user_settings.INPUT_IMG_FILE_PATH, 'temp/output.svg')
-    print("Converting SVG to instructions...")
-    instructions = svg_to_instructions('temp/output.svg')
+    if user_settings.STREAM_INSTRUCTIONS:
+        # Convert the SVG while drawing. Each call starts a new conversion, since a stream can only be drawn once.
+        def get_instructions():
+            print("Converting SVG to instructions while drawing...")
+            return stream_instructions(iter_svg_instructions('temp/output.svg'), user_settings.MAX_QUEUED_INSTRUCTIONS)
+    else:
+        print("Converting SVG to instructions...")
+        instructions = svg_to_instructions('temp/output.svg')
+
+        def get_instructions():
+            return instructions
 
     if user_settings.SHOW_PREVIEW:
         print("Showing preview...")
-        draw(instructions, only_preview=True)
+        draw(get_instructions(), only_preview=True)
         input("Press Enter to confirm preview and start drawing.")
 
     print("Drawing...")
-    draw(instructions)
+    draw(get_instructions())
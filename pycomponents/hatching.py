@@ -0,0 +1,190 @@
+from math import cos, sin, radians
+import numpy as np
+
+
+def is_closed(section: list[tuple[float, float]]) -> bool:
+    """Return whether the section forms a closed shape (first and last point are identical)."""
+    # A closed triangle is the smallest closed shape: 3 corners + the repeated first point
+    return len(section) >= 4 and section[0] == section[-1]
+
+
+def _rotate(points: np.ndarray, angle: float) -> np.ndarray:
+    """Rotate an (n, 2) array of points about the origin by the given angle (radians)."""
+    c, s = cos(angle), sin(angle)
+    return points @ np.array([[c, s], [-s, c]])
+
+
+def _scanline_segments(polygons: list[list[tuple[float, float]]], spacing: float):
+    """Intersect all polygon edges with horizontal scanlines at once.
+
+    Scanlines are placed every `spacing` units, offset by half a spacing from the lowest point so that
+    no scanline lies exactly on the bottom of the drawing. Intersections are paired using the even-odd rule,
+    so holes (a polygon inside another polygon) are left empty.
+
+    Also finds which segments can be joined into a serpentine stroke. The start (or end) of a segment is joined to
+    the start (or end) of a segment on the next scanline if the outline runs directly from one to the other, without
+    crossing any other scanline. The move between them then follows the outline, so it never jumps across a gap or
+    a hole, however steep the outline is.
+
+    Args:
+        polygons (list): List of closed polygons [[(x1, y1), (x2, y2), ..., (x1, y1)], ...]
+        spacing (float): Distance between scanlines.
+
+    Returns:
+        tuple[np.ndarray, ...]: The scanline index, scanline y value, and start/end x values of every filled segment,
+        sorted by scanline and then by x. Then, for every segment, the index of the segment on the next scanline
+        whose start is joined to its start, and the same for its end, or -1 if there is none.
+    """
+    arrays = [np.asarray(p, dtype=float) for p in polygons]
+
+    # Build the edge table: every edge of every polygon, as (x0, y0, x1, y1), in order around each polygon
+    edges = np.concatenate([np.column_stack((p[:-1], p[1:])) for p in arrays])
+    edge_polygon = np.repeat(np.arange(len(arrays)), [len(p) - 1 for p in arrays])
+    x0, y0, x1, y1 = edges.T
+
+    # Horizontal edges never cross a horizontal scanline
+    keep = y0 != y1
+    x0, y0, x1, y1, edge_polygon = x0[keep], y0[keep], x1[keep], y1[keep], edge_polygon[keep]
+    if len(y0) == 0:
+        empty = np.empty(0)
+        no_links = empty.astype(np.int64)
+        return empty.astype(np.int64), empty, empty, empty, no_links, no_links
+
+    origin = min(y0.min(), y1.min())
+    y_low = np.minimum(y0, y1)
+    y_high = np.maximum(y0, y1)
+
+    # Each edge covers the scanlines in [y_low, y_high). The half-open range means a vertex shared by two edges is
+    # only counted once (or twice, at a peak/valley), which keeps the number of crossings on every scanline even.
+    first_line = np.ceil((y_low - origin) / spacing - 0.5).astype(np.int64)
+    last_line = np.ceil((y_high - origin) / spacing - 0.5).astype(np.int64)
+    counts = last_line - first_line
+
+    # Expand every edge into one row per scanline it crosses
+    edge_index = np.repeat(np.arange(len(counts)), counts)
+    row_offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    lines = first_line[edge_index] + np.arange(len(edge_index)) - row_offsets
+    line_y = origin + (lines + 0.5) * spacing
+
+    t = (line_y - y0[edge_index]) / (y1[edge_index] - y0[edge_index])
+    crossings = x0[edge_index] + t * (x1[edge_index] - x0[edge_index])
+
+    # Sort crossings along each scanline. Each scanline has an even number of crossings, so pairing
+    # consecutive crossings over the whole sorted array never pairs crossings from different scanlines.
+    order = np.lexsort((crossings, lines))
+    seg_lines, seg_y = lines[order][0::2], line_y[order][0::2]
+    seg_start, seg_end = crossings[order][0::2], crossings[order][1::2]
+
+    # Drop zero-length segments (e.g. a scanline just touching a corner)
+    keep = seg_end - seg_start > 1e-9
+    segment_index = np.where(keep, np.cumsum(keep) - 1, -1)
+
+    # The segment each crossing belongs to (-1 if it was dropped), and whether it is the segment's end
+    crossing_segment = np.empty(len(order), dtype=np.int64)
+    crossing_segment[order] = np.repeat(segment_index, 2)
+    crossing_is_end = np.empty(len(order), dtype=bool)
+    crossing_is_end[order] = np.arange(len(order)) % 2 == 1
+
+    # Put the crossings in the order they are met when going around each polygon, to find each crossing's
+    # neighbours along the outline. Edges are already in order around each polygon, and the last wraps to the first.
+    around = np.lexsort((t, edge_index))
+    polygon = edge_polygon[edge_index][around]
+    new_polygon = np.concatenate(([True], polygon[1:] != polygon[:-1]))
+    group_starts = np.flatnonzero(new_polygon)
+    group = np.cumsum(new_polygon) - 1
+    first = group_starts[group]
+    last = np.append(group_starts[1:], len(around))[group] - 1
+    position = np.arange(len(around))
+    next_crossing = np.empty(len(around), dtype=np.int64)
+    next_crossing[around] = around[np.where(position == last, first, position + 1)]
+    previous_crossing = np.empty(len(around), dtype=np.int64)
+    previous_crossing[around] = around[np.where(position == first, last, position - 1)]
+
+    def joined_above(crossing, is_end):
+        """For each given crossing, the segment on the next scanline that the outline runs to directly."""
+        joined = np.full(len(crossing), -1, dtype=np.int64)
+        for neighbour in (previous_crossing[crossing], next_crossing[crossing]):
+            ok = ((lines[neighbour] == lines[crossing] + 1) & (crossing_segment[neighbour] >= 0)
+                  & (crossing_is_end[neighbour] == is_end))
+            joined = np.where((joined < 0) & ok, crossing_segment[neighbour], joined)
+        return joined
+
+    start_above = joined_above(order[0::2][keep], False)
+    end_above = joined_above(order[1::2][keep], True)
+
+    return seg_lines[keep], seg_y[keep], seg_start[keep], seg_end[keep], start_above, end_above
+
+
+def hatch_fill(sections: list[list[tuple[float, float]]],
+               spacing: float,
+               angle_degrees: float = 0) -> list[list[tuple[float, float]]]:
+    """Generate hatch lines that fill the closed sections of a drawing.
+
+    All closed sections are filled together using the even-odd rule, so holes stay empty. Adjacent hatch lines
+    are connected into serpentine strokes, so each filled region only needs a few pen lifts.
+
+    Args:
+        sections (list): List of sections [[(x1, y1), (x2, y2), ...], ...]. Open sections are ignored.
+        spacing (float): Distance between hatch lines, in the same units as the points.
+        angle_degrees (float, optional): Angle of the hatch lines, counterclockwise from the x axis. Defaults to 0.
+
+    Returns:
+        list: New sections [[(x1, y1), (x2, y2), ...], ...] that draw the fill.
+    """
+    if spacing <= 0:
+        raise ValueError("Hatch spacing must be positive.")
+
+    polygons = [section for section in sections if is_closed(section)]
+    if not polygons:
+        return []
+
+    # Rotate the drawing so the hatch lines are horizontal, hatch it, then rotate the result back
+    angle = radians(angle_degrees)
+    rotated = [_rotate(np.asarray(polygon, dtype=float), -angle) for polygon in polygons]
+    _, seg_y, seg_start, seg_end, start_above, end_above = _scanline_segments(rotated, spacing)
+
+    # Plain lists are much faster than numpy arrays for the element-by-element walk below
+    seg_y, seg_start, seg_end = seg_y.tolist(), seg_start.tolist(), seg_end.tolist()
+    start_above, end_above = start_above.tolist(), end_above.tolist()
+
+    used = [False] * len(seg_y)
+    strokes = []
+
+    def follow(first, left_to_right):
+        """Return the segments of a serpentine stroke starting with the given segment, drawn in the given direction.
+        The stroke goes up the scanlines for as long as the outline leads from the end of the current segment to an
+        unused segment on the next scanline."""
+        path = []
+        current = first
+        while current >= 0 and not used[current]:
+            path.append(current)
+            current = end_above[current] if left_to_right else start_above[current]
+            left_to_right = not left_to_right
+        return path
+
+    for i in range(len(seg_y)):
+        if used[i]:
+            continue
+
+        # Which way the first segment is drawn decides which side the stroke is on when it reaches each scanline, and
+        # so whether it can carry on past a split (e.g. around a hole). Use whichever direction gives a longer stroke.
+        left_to_right = True
+        path = follow(i, True)
+        backwards_path = follow(i, False)
+        if len(backwards_path) > len(path):
+            left_to_right, path = False, backwards_path
+
+        stroke = []
+        for current in path:
+            used[current] = True
+            y = seg_y[current]
+            if left_to_right:
+                stroke += [(seg_start[current], y), (seg_end[current], y)]
+            else:
+                stroke += [(seg_end[current], y), (seg_start[current], y)]
+            left_to_right = not left_to_right
+
+        points = _rotate(np.array(stroke), angle)
+        strokes.append([(x, y) for x, y in points.tolist()])
+
+    return strokes
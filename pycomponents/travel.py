@@ -0,0 +1,167 @@
+from math import inf
+from typing import Iterator
+import numpy as np
+
+# Most ends kept together in one leaf of the tree used by travel_order
+LEAF_SIZE = 8
+
+
+def travel_order(starts: list[tuple[float, float]],
+                 ends: list[tuple[float, float]],
+                 start: tuple[float, float] = None) -> Iterator[tuple[int, bool]]:
+    """Order sections to reduce how far the pen travels while it is raised.
+
+    Uses a greedy nearest-neighbour search: from wherever the pen is, the next section is the one with the closest end.
+    Sections may be drawn backwards if their last point is closer than their first. The ends of the sections are kept
+    in a k-d tree, so each step only looks at the ends near the pen, however they are spread out over the drawing.
+    The order is generated as it is needed, so the first section is available right away.
+
+    Args:
+        starts (list[tuple[float, float]]): The first point of each section.
+        ends (list[tuple[float, float]]): The last point of each section.
+        start (tuple[float, float], optional): Where the pen starts. If None, starts with the first section.
+
+    Returns:
+        Iterator[tuple[int, bool]]: The index of each section in drawing order, and whether to draw it backwards.
+    """
+    count = len(starts)
+    if count == 0:
+        return
+
+    # Every end of every section. End i is the start of section i, and end count + i is the end of section i.
+    points = np.array(list(starts) + list(ends), dtype=float)
+    xs, ys = points[:, 0].tolist(), points[:, 1].tolist()
+
+    # The tree. Each node splits its ends in two halves at the median x or y (whichever is more spread out), until
+    # there are few enough left to keep in a leaf. The children of node n are nodes 2n + 1 and 2n + 2.
+    # The ends are kept in `order`, sorted so the ends under each node are next to each other.
+    order = np.arange(len(points))
+    axis = {}  # 0 to split by x, 1 to split by y, or -1 for a leaf
+    split = {}  # Ends in the low child are at or below this value, ends in the high child are at or above it
+    remaining = {}  # How many ends are left under each node, so empty parts of the tree can be skipped
+    leaf_ends = {}  # The ends that are left in each leaf
+    leaf_of = [0] * len(points)
+    # The area each node covers, as (min x, max x, min y, max y). Every end in that area is under the node.
+    region = {0: (-inf, inf, -inf, inf)}
+
+    # Build the tree one level at a time, handling every node of the level at once
+    nodes, first, last = np.array([0]), np.array([0]), np.array([len(points)])
+    while len(nodes):
+        sizes = last - first
+        # Reduce over [first, last) of each node. The extra point makes `last` a valid index for the last node.
+        bounds = np.column_stack((first, last)).ravel()
+        sorted_points = np.append(points[order], [[0, 0]], axis=0)
+        spread = np.maximum.reduceat(sorted_points, bounds)[0::2] - np.minimum.reduceat(sorted_points, bounds)[0::2]
+        split_axis = spread.argmax(axis=1)
+
+        # Identical ends can't be split, however many there are
+        is_leaf = (sizes <= LEAF_SIZE) | (spread.max(axis=1) == 0)
+        for node, size, leaf, node_axis in zip(nodes.tolist(), sizes.tolist(), is_leaf.tolist(), split_axis.tolist()):
+            remaining[node] = size
+            axis[node] = -1 if leaf else node_axis
+        for node, start_at, end_at in zip(nodes[is_leaf].tolist(), first[is_leaf].tolist(), last[is_leaf].tolist()):
+            leaf_ends[node] = set(order[start_at:end_at].tolist())
+            for i in leaf_ends[node]:
+                leaf_of[i] = node
+
+        nodes, first, last, split_axis = nodes[~is_leaf], first[~is_leaf], last[~is_leaf], split_axis[~is_leaf]
+        sizes = last - first
+
+        # Sort the ends under each node by the node's axis, and split them in the middle
+        label = np.repeat(np.arange(len(nodes)), sizes)
+        positions = np.arange(sizes.sum()) + np.repeat(first - (np.cumsum(sizes) - sizes), sizes)
+        values = points[order[positions], split_axis[label]]
+        order[positions] = order[positions][np.lexsort((values, label))]
+        middle = (first + last) // 2
+        for node, node_axis, value in zip(nodes.tolist(), split_axis.tolist(),
+                                          points[order[middle], split_axis].tolist()):
+            split[node] = value
+            # The low child ends at the split, and the high child starts there
+            low_region, high_region = list(region[node]), list(region[node])
+            low_region[2 * node_axis + 1] = value
+            high_region[2 * node_axis] = value
+            region[2 * node + 1], region[2 * node + 2] = tuple(low_region), tuple(high_region)
+
+        # Keep the nodes of each level in the same order as their ends, which the reductions above rely on
+        nodes = np.column_stack((2 * nodes + 1, 2 * nodes + 2)).ravel()
+        first, last = np.column_stack((first, middle)).ravel(), np.column_stack((middle, last)).ravel()
+
+    # Lists are faster to look things up in than dicts. Node numbers that aren't used are never looked up.
+    size = max(axis) + 1
+    axis, split, remaining = ([values.get(node) for node in range(size)] for values in (axis, split, remaining))
+    leaf_ends, region = ([values.get(node) for node in range(size)] for values in (leaf_ends, region))
+
+    def search(top: int, x: float, y: float, best: int, best_distance: float, min_distance: float):
+        """Search the ends under a node for any closer to (x, y) than the best so far, and return the new best.
+        min_distance is the smallest possible distance (squared) from (x, y) to any end under the node."""
+        stack = [(top, min_distance)]
+        while stack:
+            node, min_distance = stack.pop()
+            if min_distance >= best_distance:
+                continue
+
+            if axis[node] < 0:
+                for i in leaf_ends[node]:
+                    distance = (xs[i] - x) ** 2 + (ys[i] - y) ** 2
+                    if distance < best_distance:
+                        best, best_distance = i, distance
+                continue
+
+            difference = (x if axis[node] == 0 else y) - split[node]
+            near, far = (2 * node + 1, 2 * node + 2) if difference < 0 else (2 * node + 2, 2 * node + 1)
+            # Search the side of the split that (x, y) is on first, since the closest end is most likely there
+            if remaining[far]:
+                stack.append((far, difference ** 2))
+            if remaining[near]:
+                stack.append((near, min_distance))
+        return best, best_distance
+
+    def nearest(x: float, y: float, node: int) -> int:
+        """Return the remaining end closest to (x, y), starting from a leaf whose region contains (x, y).
+        The closest end is usually close by in the tree, so search outwards from that leaf rather than from the top."""
+        best, best_distance = search(node, x, y, -1, inf, 0)
+        while node > 0:
+            # Anything outside of this node's region is at least this far away
+            min_x, max_x, min_y, max_y = region[node]
+            distance_outside = min(x - min_x, max_x - x, y - min_y, max_y - y)
+            if best_distance <= distance_outside ** 2:
+                break
+
+            parent = (node - 1) // 2
+            sibling = node + 1 if node % 2 else node - 1
+            if remaining[sibling]:
+                difference = (x if axis[parent] == 0 else y) - split[parent]
+                best, best_distance = search(sibling, x, y, best, best_distance, difference ** 2)
+            node = parent
+        return best
+
+    def leaf_containing(x: float, y: float) -> int:
+        node = 0
+        while axis[node] >= 0:
+            below = (x if axis[node] == 0 else y) < split[node]
+            node = 2 * node + 1 if below else 2 * node + 2
+        return node
+
+    def remove(i: int):
+        node = leaf_of[i]
+        leaf_ends[node].discard(i)
+        remaining[node] -= 1
+        while node > 0:
+            node = (node - 1) // 2
+            remaining[node] -= 1
+
+    position = start if start is not None else starts[0]
+    leaf = leaf_containing(*position)
+
+    for _ in range(count):
+        closest = nearest(*position, leaf)
+        index, backwards = closest % count, closest >= count
+        yield index, backwards
+
+        # Remove both ends of the section from the tree, so it isn't picked again
+        remove(index)
+        remove(index + count)
+
+        # The pen ends up at the other end of the section
+        other_end = closest + count if closest < count else closest - count
+        position, leaf = (xs[other_end], ys[other_end]), leaf_of[other_end]
@@ -12,6 +12,31 @@ START_FROM_POINT = 0
 # Recommended range = (0, 2]
 MAX_CM_BETWEEN_POINTS = .2
 
+# Whether or not to fill closed shapes with hatch lines. If False, only the outlines are drawn.
+FILL_CLOSED_SHAPES = False
+# Distance between hatch lines.
+# Lower value = more solid fill, but slower drawing
+# Should be about the width of the line your pen draws
+HATCH_SPACING_CM = .3
+# Angle of the hatch lines, counterclockwise from horizontal
+HATCH_ANGLE_DEGREES = 45
+
+# Split the drawing into layers, each drawn with a different pen. The program pauses for a pen swap between layers.
+# None = one layer, "color" = one layer per stroke (or fill) color, "group" = one layer per <g> element directly inside
+# the <svg> element, named by its id. Layers made in Inkscape are <g> elements like this.
+LAYER_BY = None
+# The layers to draw first, in order, e.g. ["#ffff00", "#000000"] or ["background", "outline"].
+# Any layers not listed here are drawn after these, in the order they appear in the SVG.
+LAYER_ORDER = []
+
+# Whether or not to start drawing while the SVG is still being converted.
+# Useful for very large drawings, which would otherwise take a long time (and a lot of memory) to convert up front.
+# The progress bar will only show the number of points drawn, since the total isn't known until conversion finishes.
+# Note: with FILL_CLOSED_SHAPES on, all closed shapes and their hatch lines are still kept in memory at once.
+STREAM_INSTRUCTIONS = False
+# How many converted points can wait to be drawn at once when streaming.
+MAX_QUEUED_INSTRUCTIONS = 1000
+
 # The USB port the Arduino is connected to. If you aren't sure, run list_usb_ports.py
 # The name will likely have "Serial" or "Arduino" in it.
 ARDUINO_USB_PORT = "COM13"